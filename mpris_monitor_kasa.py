@@ -3,10 +3,13 @@
 import argparse
 import asyncio
 import enum
+import json
 import logging
+import os
+import signal
+import sys
 import time
 
-import kasa
 from dbus_next import BusType, Message, MessageType
 from dbus_next.aio import MessageBus
 from gpiozero import Button
@@ -16,6 +19,19 @@ _LOGGER = logging.getLogger("mpris-monitor")
 
 _TURNTABLE_PLAYER_NAME = "org.mpris.MediaPlayer2.Turntable"
 
+_DEVICE_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "mpris-monitor-kasa.json")
+
+
+class PlaybackStatus(enum.Enum):
+    PLAYING = "Playing"
+    PAUSED = "Paused"
+    STOPPED = "Stopped"
+
+
+# Map MPRIS PlaybackStatus strings to enum members
+_PLAYBACK_STATUS = {status.value: status for status in PlaybackStatus}
+
 
 class MprisDbusMonitor():
     """A MPRIS monitor based on asyncio via dbus-next."""
@@ -25,39 +41,93 @@ class MprisDbusMonitor():
         self.playback_status_changed = None
         self.player_removed = None
         self.bus = None
+        self._stop_requested = False
 
     async def start(self):
         # Connect to the system bus
         _LOGGER.info("Connecting to system bus.")
         self.bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
 
-        _LOGGER.info("Fetching names from D-Bus.")
-        for name in filter(lambda n: n.startswith("org.mpris.MediaPlayer2"), await self._dbus_list_names()):
-            owner = await self._dbus_get_name_owner(name)
-            self.friendly_names[owner] = name
-            _LOGGER.debug("%s owns %s.", owner, name)
+        # Stop may have been requested while connecting
+        if self._stop_requested:
+            self.bus.disconnect()
+            return
+
+        try:
+            await self._subscribe()
+        except Exception:
+            # Pending calls fail when stop() disconnects the bus during startup
+            if self._stop_requested:
+                return
+            raise
 
+        _LOGGER.info("Monitoring for D-Bus signals.")
+        await self.bus.wait_for_disconnect()
+
+    async def _subscribe(self):
+        """Add signal matches and the message handler, then fetch current name owners."""
         # Add matches for NameOwnerChanged and MRPIS PropertiesChanged signals
-        await self._dbus_add_match(["member='NameOwnerChanged',arg0namespace='org.mpris.MediaPlayer2'"])
-        await self._dbus_add_match(["type='signal',member='PropertiesChanged',path='/org/mpris/MediaPlayer2'"])
+        # Filter on arg0 so the daemon drops unrelated signals before they reach us
+        await self._dbus_add_match(["type='signal',sender='org.freedesktop.DBus',interface='org.freedesktop.DBus',"
+                                    "member='NameOwnerChanged',arg0namespace='org.mpris.MediaPlayer2'"])
+        await self._dbus_add_match(["type='signal',interface='org.freedesktop.DBus.Properties',member='PropertiesChanged',"
+                                    "path='/org/mpris/MediaPlayer2',arg0='org.mpris.MediaPlayer2.Player'"])
+
+        # Signals are held until the name snapshot is complete so senders are
+        # reported under their friendly names, then replayed in arrival order
+        pending = []
 
-        # Define a common message handler to filter and call more specific handlers
+        # Define a common message handler to queue or dispatch signals
         def _message_handler(msg):
             # _LOGGER.debug("Got new DBus message: %s", vars(msg))
 
-            if msg.path == "/org/mpris/MediaPlayer2" and msg.member == "PropertiesChanged":
-                self._properties_changed(
-                    msg.sender, msg.interface, msg.member, msg.body)
+            # Method returns for our own calls also pass through here
+            if msg.message_type != MessageType.SIGNAL:
+                return
 
-            if msg.path == "/org/freedesktop/DBus" and msg.member == "NameOwnerChanged":
-                self._name_owner_changed(
-                    msg.sender, msg.interface, msg.member, msg.body)
+            if pending is not None:
+                pending.append(msg)
+            else:
+                self._dispatch_signal(msg)
 
-        # Add handler
-        _LOGGER.info("Monitoring for D-Bus signals.")
+        # Add handler before fetching names so no owner changes are missed
         self.bus.add_message_handler(_message_handler)
 
-        await self.bus.wait_for_disconnect()
+        _LOGGER.info("Fetching names from D-Bus.")
+        names = [n for n in await self._dbus_list_names()
+                 if n.startswith("org.mpris.MediaPlayer2")]
+
+        # Query all owners concurrently
+        owners = await asyncio.gather(*map(self._dbus_get_name_owner, names))
+        for name, owner in zip(names, owners):
+            # Name may have been released since it was listed
+            if owner is None:
+                continue
+
+            self.friendly_names[owner] = name
+            _LOGGER.debug("%s owns %s.", owner, name)
+
+        # Replay signals received while fetching names
+        queued, pending = pending, None
+        for msg in queued:
+            self._dispatch_signal(msg)
+
+    def stop(self):
+        # Disconnecting the bus returns from start(). Record the request in case
+        # the bus is not connected yet
+        self._stop_requested = True
+        if self.bus:
+            self.bus.disconnect()
+
+    def _dispatch_signal(self, msg):
+        """Filter signals and call more specific handlers."""
+        if msg.path == "/org/mpris/MediaPlayer2" and msg.member == "PropertiesChanged":
+            self._properties_changed(
+                msg.sender, msg.interface, msg.member, msg.body)
+
+        elif msg.path == "/org/freedesktop/DBus" and msg.member == "NameOwnerChanged":
+            self._name_owner_changed(
+                msg.sender, msg.interface, msg.member, msg.body)
 
     async def _dbus_get_name_owner(self, name):
         """Get the owner of the provided name."""
@@ -69,6 +139,9 @@ class MprisDbusMonitor():
                     signature='s',
                     body=[name]))
 
+        if reply.message_type != MessageType.METHOD_RETURN:
+            return None
+
         return reply.body[0]
 
     async def _dbus_list_names(self):
@@ -98,16 +171,27 @@ class MprisDbusMonitor():
 
     def _properties_changed(self, sender, iface, member, body):
         """Callback for PropertiesChanged signal."""
-        _interface, values, *remaining = body
+        interface, values, *remaining = body
+
+        # Only the player interface carries the playback status
+        if interface != "org.mpris.MediaPlayer2.Player":
+            return
 
         # Fetch friendly name if it exists
         sender = self.friendly_names.get(sender, sender)
 
         _LOGGER.debug("'%s' '%s' '%s' = '%s'", sender, iface, member, body)
 
-        if self.playback_status_changed and "PlaybackStatus" in values:
-            self.playback_status_changed(
-                sender, values["PlaybackStatus"].value)
+        playback_status = values.get("PlaybackStatus")
+        if self.playback_status_changed is None or playback_status is None:
+            return
+
+        status = _PLAYBACK_STATUS.get(playback_status.value)
+        if status is None:
+            return
+
+        # Intern sender since it's used as a key in player sets
+        self.playback_status_changed(sys.intern(sender), status)
 
     def _name_owner_changed(self, sender, iface, member, body):
         """Callback for NameOwnerChanged signal."""
@@ -117,14 +201,12 @@ class MprisDbusMonitor():
 
         # Remove old owner
         if old_owner:
-            try:
-                del self.friendly_names[old_owner]
-            except KeyError:
-                # Ignore failed removes
-                pass
+            # Report the player under the same name used for its status
+            # changes, the unique name if no friendly name was known
+            player = self.friendly_names.pop(old_owner, old_owner)
 
             if self.player_removed:
-                self.player_removed(name)
+                self.player_removed(player)
 
         # Add new owner
         if new_owner:
@@ -132,21 +214,50 @@ class MprisDbusMonitor():
 
 
 class AsyncTimer():
-    """A timer class built on asycio."""
+    """A timer class built on the asyncio loop's scheduler."""
 
-    def __init__(self, timeout, callback):
-        self._timeout = timeout
+    def __init__(self, callback):
         self._callback = callback
+        self._handle = None
+        self._deadline = None
+
+    def _expired(self):
+        self._handle = None
 
-    async def _run(self):
-        await asyncio.sleep(self._timeout)
-        await self._callback()
+        # Timer was cancelled after the handle was scheduled
+        if self._deadline is None:
+            return
+
+        # Deadline was pushed back, wait for the remainder
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._deadline:
+            self._handle = loop.call_at(self._deadline, self._expired)
+            return
+
+        # Timer callbacks run on the loop, so the coroutine can be started directly
+        self._deadline = None
+        asyncio.create_task(self._callback())
 
-    def start(self):
-        self._task = asyncio.create_task(self._run())
+    def start(self, timeout):
+        # Restart the timer if it's already running
+        loop = asyncio.get_running_loop()
+        self._deadline = loop.time() + timeout
+
+        # Reuse a pending handle unless it would fire after the new deadline
+        if self._handle and self._handle.when() > self._deadline:
+            self._handle.cancel()
+            self._handle = None
+
+        if self._handle is None:
+            self._handle = loop.call_at(self._deadline, self._expired)
 
     def cancel(self):
-        self._task.cancel()
+        # Pending handles are left scheduled and ignore the expiry
+        self._deadline = None
+
+    @property
+    def running(self):
+        return self._deadline is not None
 
 
 class SystemController():
@@ -157,6 +268,10 @@ class SystemController():
         PAUSED = 2
         IDLE = 3
 
+    # Delay before retrying a failed power on (seconds). Players repeat their
+    # status often, and each attempt can block updates for a full device timeout
+    _ACTIVATE_RETRY_DELAY = 30
+
     def __init__(self, short_timeout, long_timeout):
         # Save running loop
         self._loop = asyncio.get_running_loop()
@@ -166,7 +281,11 @@ class SystemController():
 
         self._state = SystemController.State.IDLE
         self._active_players = set()
-        self._timer = None
+        self._timer = AsyncTimer(self._timeout)
+        self._retry_time = None
+
+        # Serialize updates and timeouts since power control yields to the loop
+        self._lock = asyncio.Lock()
 
         # Callbacks
         self.activate = None
@@ -177,12 +296,26 @@ class SystemController():
         self.on_stop_timer = None
 
     async def _activate(self):
+        # Hold off after a failure instead of retrying on every update
+        if self._retry_time is not None and self._loop.time() < self._retry_time:
+            _LOGGER.debug("Skipping power on after recent failure.")
+            return False
+
         _LOGGER.info("Enabling system power.")
 
         if self.activate:
-            await self.activate()
-
+            try:
+                await self.activate()
+            except Exception as ex:
+                # Remain idle so a later update retries
+                self._retry_time = self._loop.time() + SystemController._ACTIVATE_RETRY_DELAY
+                _LOGGER.error("Failed to enable system power, retrying after %s s. Error: %s",
+                              SystemController._ACTIVATE_RETRY_DELAY, ex)
+                return False
+
+        self._retry_time = None
         self._state = SystemController.State.ACTIVE
+        return True
 
     async def _deactivate(self):
         _LOGGER.info("Disabling system power.")
@@ -192,112 +325,134 @@ class SystemController():
 
         self._state = SystemController.State.IDLE
 
-        # Stop and destroy timer if present
-        if self._timer:
-            self._timer.cancel()
-            self._timer = None
-
-    async def _update_async(self, sender, state):
-        _LOGGER.info("Player '{0}' status: {1}".format(sender, state))
+        # Stop timer if running
+        self._timer.cancel()
 
-        if state == "Playing":
-            # Add the sender to the active list
-            _LOGGER.debug("Adding player '{0}' to active list.".format(sender))
-            self._active_players.add(sender)
+    async def _timeout(self):
+        async with self._lock:
+            # Players may have changed while waiting for the lock
+            if self._active_players or self._timer.running:
+                return
 
-            # Activate if necessary
             if self._state == SystemController.State.IDLE:
-                await self._activate()
+                return
 
-            # Ensure state is active
-            self._state = SystemController.State.ACTIVE
+            await self._deactivate()
 
-            # Disable the shutdown timer if running
-            if self._timer:
-                _LOGGER.debug("Disabled shutdown timer.")
-                self._timer.cancel()
+    async def _playing(self, sender):
+        # Activate if necessary
+        if self._state == SystemController.State.IDLE and not await self._activate():
+            # Player isn't active without power, so the next Playing retries
+            self._active_players.discard(sender)
+            return
 
-            # Delete existing timer
-            self._timer = None
+        # Ensure state is active
+        self._state = SystemController.State.ACTIVE
 
-            # Call callback
-            if self.on_playing:
-                self.on_playing()
+        # Disable the shutdown timer if running
+        if self._timer.running:
+            _LOGGER.debug("Disabled shutdown timer.")
+            self._timer.cancel()
 
-        elif state == "Paused":
-            # Player is not longer active
-            self._active_players.discard(sender)
-            _LOGGER.debug(
-                "Removed player '{0}' from active list.".format(sender))
+        # Call callback
+        if self.on_playing:
+            self.on_playing()
 
-            # No action unless this is the last player
-            if len(self._active_players):
-                return
+    async def _paused(self, sender):
+        # Start shutdown timer with long interval
+        _LOGGER.debug(
+            "Starting long (%s s) shutdown timer.", self._long_timeout)
+        self._timer.start(self._long_timeout)
+        self._state = SystemController.State.PAUSED
 
-            # Nothing to do if already idle
-            if self._state == SystemController.State.IDLE:
-                return
+        # Call callback
+        if self.on_pause_timer:
+            self.on_pause_timer()
 
-            # Start shutdown timer with long interval
-            _LOGGER.debug(
-                "Starting long ({0} s) shutdown timer.".format(self._long_timeout))
-            self._timer = AsyncTimer(self._long_timeout, self._deactivate)
-            self._timer.start()
-            self._state = SystemController.State.PAUSED
+    async def _stopped(self, sender):
+        # Leave an existing short timer running
+        if self._state != SystemController.State.PAUSED and self._timer.running:
+            return
+
+        # Start shutdown timer with short interval
+        _LOGGER.debug(
+            "Starting short (%s s) shutdown timer.", self._short_timeout)
+        self._timer.start(self._short_timeout)
+
+        # Call callback
+        if self.on_stop_timer:
+            self.on_stop_timer()
+
+    # Handlers for each (system state, player status) pair
+    # Pauses and stops are ignored when already idle
+    _TRANSITIONS = {
+        (State.IDLE, PlaybackStatus.PLAYING): _playing,
+        (State.ACTIVE, PlaybackStatus.PLAYING): _playing,
+        (State.PAUSED, PlaybackStatus.PLAYING): _playing,
+        (State.ACTIVE, PlaybackStatus.PAUSED): _paused,
+        (State.PAUSED, PlaybackStatus.PAUSED): _paused,
+        (State.ACTIVE, PlaybackStatus.STOPPED): _stopped,
+        (State.PAUSED, PlaybackStatus.STOPPED): _stopped,
+    }
 
-            # Call callback
-            if self.on_pause_timer:
-                self.on_pause_timer()
+    async def _update_async(self, sender, state):
+        async with self._lock:
+            await self._update_locked(sender, state)
+
+    async def _update_locked(self, sender, state):
+        # Players repeat their status with other property changes, nothing to
+        # do if this player is already active
+        if (state is PlaybackStatus.PLAYING and self._state is SystemController.State.ACTIVE
+                and sender in self._active_players and not self._timer.running):
+            return
 
-        elif state == "Stopped":
+        _LOGGER.info("Player '%s' status: %s", sender, state.value)
+
+        if state is PlaybackStatus.PLAYING:
+            # Add the sender to the active list
+            _LOGGER.debug("Adding player '%s' to active list.", sender)
+            self._active_players.add(sender)
+        else:
             # Player is not longer active
             self._active_players.discard(sender)
             _LOGGER.debug(
-                "Removed player '{0}' from active list.".format(sender))
+                "Removed player '%s' from active list.", sender)
 
             # No action unless this is the last player
             if len(self._active_players):
                 return
 
-            # Nothing to do if already idle
-            if self._state == SystemController.State.IDLE:
-                return
-
-            if self._state == SystemController.State.PAUSED:
-                # Cancel existing long timer
-                assert (self._timer)
-                self._timer.cancel()
-            elif self._timer:
-                return
-
-            # Start shutdown timer with short interval
-            _LOGGER.debug(
-                "Starting short ({0} s) shutdown timer.".format(self._short_timeout))
-            self._timer = AsyncTimer(self._short_timeout, self._deactivate)
-            self._timer.start()
-
-            # Call callback
-            if self.on_stop_timer:
-                self.on_stop_timer()
+        handler = SystemController._TRANSITIONS.get((self._state, state))
+        if handler:
+            await handler(self, sender)
 
     def shutdown(self):
-        # Stop and destroy timer if present
-        if self._timer:
-            self._timer.cancel()
-            self._timer = None
+        # Stop timer if running
+        self._timer.cancel()
 
     def update(self, sender, state):
-        # Ensure update task runs in the loop
-        asyncio.run_coroutine_threadsafe(
-            self._update_async(sender, state), self._loop)
+        # D-Bus signals are delivered on the loop so the task can be created
+        # directly. Button callbacks arrive from other threads and must be
+        # handed to the loop
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+
+        if in_loop:
+            self._loop.create_task(self._update_async(sender, state))
+        else:
+            asyncio.run_coroutine_threadsafe(
+                self._update_async(sender, state), self._loop)
 
     def remove_player(self, sender):
         # Treat removal like a stopped status
-        self.update(sender, "Stopped")
+        self.update(sender, PlaybackStatus.STOPPED)
 
     @property
     def active_players(self):
-        return self._active_players
+        # Return a snapshot since callers may iterate from other threads
+        return frozenset(self._active_players)
 
 
 class LED():
@@ -335,50 +490,114 @@ class LED():
         self._set_color(LED.COLOR_GREEN)
 
 
+def _load_device_cache():
+    try:
+        with open(_DEVICE_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_device_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(_DEVICE_CACHE_PATH), exist_ok=True)
+        with open(_DEVICE_CACHE_PATH, "w") as f:
+            json.dump(cache, f)
+    except OSError as ex:
+        _LOGGER.warning("Could not write device cache. Error: %s", ex)
+
+
+async def _connect_device(host):
+    """Connect to a Kasa device, reusing cached connection parameters to skip discovery."""
+    import kasa
+
+    cache = _load_device_cache()
+
+    if host in cache:
+        _LOGGER.info("Connecting to Kasa device at %s.", host)
+        try:
+            config = kasa.DeviceConfig.from_dict(cache[host])
+            return await kasa.Device.connect(config=config)
+        except Exception as ex:
+            _LOGGER.warning(
+                "Cached connection to %s failed, falling back to discovery. Error: %s", host, ex)
+
+    _LOGGER.info("Discovering Kasa device at %s.", host)
+    device = await kasa.Discover.discover_single(host)
+
+    # Discovery doesn't fetch device state, unlike Device.connect()
+    await device.update()
+
+    # Save connection parameters for next time
+    cache[host] = device.config.to_dict()
+    _save_device_cache(cache)
+
+    return device
+
+
 async def _run(args) -> None:
+    # Deferred since kasa is slow to import and unneeded for --help or bad args
+    import kasa
+
     # Dump discovered devices if requested
     if args.discover:
         _LOGGER.info("Discovering Kasa devices.")
         kasa_devices = (await kasa.Discover.discover(timeout=1)).items()
 
-        _LOGGER.info("Found {0} Kasa devices.".format(len(kasa_devices)))
+        _LOGGER.info("Found %s Kasa devices.", len(kasa_devices))
         for _, device in kasa_devices:
             _LOGGER.info(device)
 
         exit()
 
-    # Discover available devices
-    _LOGGER.info("Discovering Kasa device at %s.", args.host)
+    # Connect to the device
     try:
-        strip = await kasa.Discover.discover_single(args.host)
+        strip = await _connect_device(args.host)
     except kasa.exceptions.KasaException as ex:
         _LOGGER.error(
             "Could not connect to Kasa device at %s. Error: %s", args.host, ex)
         exit()
 
-    # Update strip information
-    await strip.update()
-
     _LOGGER.info("Found Kasa device '%s' @ %s.", strip.alias, args.host)
 
+    if not strip.children:
+        _LOGGER.error(
+            "Kasa device at %s has no child plugs to control.", args.host)
+        exit()
+
     # Setup the LED
     led = LED(12)  # PWM
     led.off()
 
+    # Resolve plug order once
+    # Preamp = 0
+    # Amp 1 = 1
+    # Amp 2 = 2
+    preamp, *amps = strip.children
+
+    async def set_power(plugs, on):
+        # Switch plugs concurrently and log failures so remaining plugs are still switched
+        results = await asyncio.gather(
+            *(plug.turn_on() if on else plug.turn_off() for plug in plugs), return_exceptions=True)
+
+        for plug, result in zip(plugs, results):
+            if isinstance(result, Exception):
+                _LOGGER.error(
+                    "Could not switch plug '%s'. Error: %s", plug.alias, result)
+
     # Local coroutines for controller callback
     async def power_on():
-        # Preamp = 0
-        # Amp 1 = 1
-        # Amp 2 = 2
-        for plug in strip.children:
-            await plug.turn_on()
-            await asyncio.sleep(1)
+        # Power the preamp first, then both amps together once it settles
+        # Amps must not be powered without the preamp so failures are raised
+        await preamp.turn_on()
+        await asyncio.sleep(1)
+        await set_power(amps, True)
 
     async def power_off():
         # Turn off in reverse order
-        for plug in reversed(strip.children):
-            await plug.turn_off()
-            await asyncio.sleep(1)
+        await set_power(amps, False)
+        await asyncio.sleep(1)
+        await set_power([preamp], False)
 
         # Turn off LED
         led.off()
@@ -410,9 +629,9 @@ async def _run(args) -> None:
 
         # When button is pressed remove/add turntable as player
         if _TURNTABLE_PLAYER_NAME not in controller.active_players:
-            controller.update(_TURNTABLE_PLAYER_NAME, "Playing")
+            controller.update(_TURNTABLE_PLAYER_NAME, PlaybackStatus.PLAYING)
         else:
-            controller.update(_TURNTABLE_PLAYER_NAME, "Stopped")
+            controller.update(_TURNTABLE_PLAYER_NAME, PlaybackStatus.STOPPED)
 
             # Set LED to blue in case any other players are active
             led.blue()
@@ -434,18 +653,21 @@ async def _run(args) -> None:
     mpris_monitor.playback_status_changed = controller.update
     mpris_monitor.player_removed = controller.remove_player
 
+    # Shutdown cleanly when interrupted or stopped by systemd
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGINT, mpris_monitor.stop)
+    loop.add_signal_handler(signal.SIGTERM, mpris_monitor.stop)
+
     try:
         await mpris_monitor.start()
-    except:
-        pass
+    finally:
+        _LOGGER.info("Shutting down.")
 
-    _LOGGER.info("Shutting down.")
+        # Stop controller timers
+        controller.shutdown()
 
-    # Stop controller timers
-    controller.shutdown()
-
-    # Clear LED
-    led.off()
+        # Clear LED
+        led.off()
 
 
 def main():